@@ -1,128 +1,378 @@
 import asyncio
+import codecs
+from dataclasses import dataclass
+import ctypes
+import ctypes.util
 import json
+import logging
 import os
-import subprocess
-import shlex
+import re
 import signal
-import tempfile
-import uuid
-import glob
+import struct
 from pathlib import Path
 import sys
-import time
-import threading
 
 from mcp.server.models import InitializationOptions
 import mcp.types as types
-from mcp.server import NotificationOptions, Server
+from mcp.server import Server
 import mcp.server.stdio
 
-from mcp.server.lowlevel import NotificationOptions
+logger = logging.getLogger("simple_bash_mcp")
 
 # Configuration file path
 CONFIG_FILE = Path(__file__).parent / "config.json"
 
-# Configuration and tracking variables
-config = {}
-config_last_modified = 0
-config_lock = threading.RLock()
+# Characters and sequences rejected when strict validation is enabled
+INJECTION_PATTERNS = (";", "&&", "||", "`", "$(", ">", "<", "|", "#")
+# Longest patterns first so that e.g. "||" is reported instead of "|"
+INJECTION_RE = re.compile("|".join(re.escape(p) for p in sorted(INJECTION_PATTERNS, key=len, reverse=True)))
+INJECTION_PATTERNS_STR = ", ".join(f"'{p}'" for p in INJECTION_PATTERNS)
+
+# Environment for spawned commands, built once instead of per invocation and
+# replaced by the login shell environment in capture_login_env().
+# TERM=dumb keeps commands from emitting terminal control sequences.
+BASE_ENV = {**os.environ, "TERM": "dumb"}
+LOGIN_ENV_MARKER = b"__SIMPLE_BASH_MCP_ENV__"
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """Immutable view of config.json plus the lookup structures derived from it."""
+    allowed_commands: frozenset[str]
+    allowed_commands_msg: str
+    allowed_dirs_exact: frozenset[str]
+    allowed_dir_prefixes: tuple[str, ...]
+    allowed_dirs_msg: str
+    validate_strictly: bool
+    max_output_size: int
+
+    @classmethod
+    def from_json(cls, data: dict) -> "ConfigSnapshot":
+        """Build a snapshot from the parsed contents of config.json."""
+        allowed_dirs = [os.path.realpath(d) for d in data["allowedDirectories"]]
+        return cls(
+            allowed_commands=frozenset(data["allowedCommands"]),
+            allowed_commands_msg=", ".join(sorted(data["allowedCommands"])),
+            allowed_dirs_exact=frozenset(allowed_dirs),
+            # With a trailing separator, so "/tmp" does not match "/tmpfoo"
+            allowed_dir_prefixes=tuple(os.path.join(d, "") for d in allowed_dirs),
+            allowed_dirs_msg="\n- ".join(data["allowedDirectories"]),
+            validate_strictly=data.get("validateCommandsStrictly", True),
+            max_output_size=data.get("maxOutputSize", 1048576),  # Default 1MB
+        )
+
+# Configuration tracking: (st_mtime_ns, st_size) of the file the current
+# `config` snapshot was parsed from
+config_stat_key = None
 
 # Load configuration initially
 def load_config():
-    global config, config_last_modified
-    with config_lock:
-        with open(CONFIG_FILE, "r") as f:
-            config = json.load(f)
-        config_last_modified = os.path.getmtime(CONFIG_FILE)
-        print(f"Configuration loaded at {time.strftime('%Y-%m-%d %H:%M:%S')}", file=sys.stderr)
-        return config
+    global config, config_stat_key
+    # Stat the opened file so the key describes exactly what is parsed, and
+    # skip the parse when a change event did not actually modify the file
+    with open(CONFIG_FILE, "rb") as f:
+        st = os.fstat(f.fileno())
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if stat_key == config_stat_key:
+            return config
+        # One bytes read; json detects the UTF encoding and skips the text-IO layer
+        new_config = ConfigSnapshot.from_json(json.loads(f.read()))
+    config_stat_key = stat_key
+    config = new_config
+    logger.info("Configuration loaded from %s", CONFIG_FILE)
+    return config
 
 # Check for configuration changes
-def check_config_updates():
-    global config_last_modified
-    try:
-        current_mtime = os.path.getmtime(CONFIG_FILE)
-        if current_mtime > config_last_modified:
-            print(f"Configuration file changed, reloading...", file=sys.stderr)
-            load_config()
-            return True
+async def check_config_updates():
+    """Reload the configuration if the file changed since it was last parsed.
+
+    The stat runs in a worker thread so that a slow filesystem does not stall
+    the event loop. Raises OSError if the file cannot be stat'ed.
+    """
+    st = await asyncio.to_thread(os.stat, CONFIG_FILE)
+    if (st.st_mtime_ns, st.st_size) == config_stat_key:
         return False
+    logger.info("Configuration file changed, reloading...")
+    reload_config()
+    return True
+
+# inotify(7) constants used to watch the configuration file
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# Editors often save in several steps (write temp file, rename, chmod), so
+# reloads wait until change events have been quiet for this long.
+CONFIG_RELOAD_DELAY = 0.1
+config_reload_handle = None
+
+def start_config_watcher(loop):
+    """Watch the configuration file with inotify and reload it on change.
+
+    Returns the inotify file descriptor, or None if inotify is unavailable
+    (e.g. on non-Linux systems), in which case the caller should poll.
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch the directory rather than the file: editors often save by
+        # writing a new file and renaming it over the old one.
+        wd = libc.inotify_add_watch(fd, os.fsencode(CONFIG_FILE.parent), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, "inotify_add_watch failed")
+    except (OSError, AttributeError) as e:
+        logger.warning("inotify unavailable, falling back to polling: %s", e)
+        return None
+    loop.add_reader(fd, handle_config_events, fd)
+    return fd
+
+def handle_config_events(fd):
+    """Drain pending inotify events and reload the configuration if it changed."""
+    try:
+        data = os.read(fd, 4096)
+    except BlockingIOError:
+        return
+    config_name = os.fsencode(CONFIG_FILE.name)
+    changed = False
+    offset = 0
+    while offset < len(data):
+        _, _, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+        offset += INOTIFY_EVENT.size
+        if data[offset:offset + name_len].rstrip(b"\0") == config_name:
+            changed = True
+        offset += name_len
+    if changed:
+        global config_reload_handle
+        if config_reload_handle is not None:
+            config_reload_handle.cancel()
+        config_reload_handle = asyncio.get_running_loop().call_later(CONFIG_RELOAD_DELAY, reload_config)
+
+def reload_config():
+    """Reload the configuration after a change notification."""
+    try:
+        load_config()
     except Exception as e:
-        print(f"Error checking configuration updates: {str(e)}", file=sys.stderr)
-        return False
+        logger.error("Error reloading configuration: %s", e)
 
-# Initialize configuration
-load_config()
+def configure_logging():
+    """Send this server's log messages to stderr; stdout is reserved for MCP.
 
-# Helper function to safely clean up temp files
-def self_cleanup_tempfiles(*files):
-    """Helper function to safely clean up temporary files."""
-    for file in files:
-        if file:
-            try:
-                if os.path.exists(file):
-                    os.unlink(file)
-            except Exception:
-                pass
+    Only the simple_bash_mcp logger is configured. The root logger is left
+    alone so that libraries such as the MCP SDK stay at their default of
+    warnings and errors only, instead of logging every request.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    level_name = os.environ.get("MCP_LOG_LEVEL", "INFO")
+    # getLevelName() maps known names to their number and returns a string otherwise
+    level = logging.getLevelName(level_name.upper())
+    if isinstance(level, int):
+        logger.setLevel(level)
+    else:
+        logger.setLevel(logging.INFO)
+        logger.warning("Unknown MCP_LOG_LEVEL %r, using INFO", level_name)
+
+# Initialize logging and configuration.
+# `config` is an immutable ConfigSnapshot that is only ever replaced as a
+# whole. The only writer is load_config() on the event loop thread, and
+# rebinding a module global is atomic, so readers need no lock.
+configure_logging()
+config: ConfigSnapshot = load_config()
+
+async def read_capped(stream, limit, on_overflow):
+    """Read a subprocess stream, keeping at most limit + 1 bytes.
+
+    Calls on_overflow() and stops reading as soon as the limit is exceeded, so
+    a runaway command cannot grow memory beyond the output cap. The extra
+    byte tells the caller that the output was truncated.
+    """
+    data = bytearray()
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        room = limit + 1 - len(data)
+        if len(chunk) >= room:
+            # Copy only what fits instead of growing the buffer past the cap
+            data += memoryview(chunk)[:room]
+            on_overflow()
+            break
+        data += chunk
+    return data
+
+def decode_output(data, truncated=False):
+    """Decode captured output, translating newlines like a text-mode file read.
+
+    If the output was cut at the size limit, a UTF-8 sequence split by the
+    cut is dropped instead of being decoded as a replacement character.
+    """
+    if truncated:
+        # Without final=True the decoder holds back an incomplete trailing sequence
+        text = codecs.getincrementaldecoder("utf-8")("replace").decode(data)
+    else:
+        text = data.decode("utf-8", errors="replace")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+# Background jobs (`cmd &`) inherit the output pipes and may keep them open
+# long after bash exits. Output arriving within this many seconds of the exit
+# is still collected; after that the pipes are closed.
+OUTPUT_DRAIN_TIMEOUT = 0.1
+
+async def open_output_pipe():
+    """Create a pipe for command output and a StreamReader on its read end.
+
+    Returns (reader, transport, write_fd). The pipe belongs to the server, not
+    to the subprocess transport, so Process.wait() returns as soon as bash
+    exits even while background jobs hold the write end (on Python 3.12+ it
+    otherwise also waits for the pipes to close). The caller passes write_fd
+    to the child, closes it after spawning and closes transport when done.
+    """
+    read_fd, write_fd = os.pipe()
+    reader = asyncio.StreamReader()
+    try:
+        transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(reader), open(read_fd, "rb", buffering=0)
+        )
+    except BaseException:
+        os.close(write_fd)
+        raise
+    return reader, transport, write_fd
+
+async def communicate_capped(process, pipes, limit):
+    """Collect stdout and stderr of a process, killing it if either exceeds limit bytes.
+
+    pipes holds the (reader, transport) pairs of stdout and stderr. Reading
+    stops OUTPUT_DRAIN_TIMEOUT seconds after the process exits, and the pipes
+    are closed on return or cancellation.
+    """
+    def kill_process_group():
+        # With start_new_session=True the group ID is bash's PID. Don't look it
+        # up with getpgid(): once bash has been reaped that fails, while
+        # background jobs left in the group are still alive.
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    readers = asyncio.ensure_future(asyncio.gather(
+        *(read_capped(reader, limit, kill_process_group) for reader, _ in pipes)
+    ))
+    try:
+        exit_code = await process.wait()
+        await asyncio.wait([readers], timeout=OUTPUT_DRAIN_TIMEOUT)
+    finally:
+        # Closing a pipe ends its reader with what was already received
+        for _, transport in pipes:
+            transport.close()
+    stdout_data, stderr_data = await readers
+    return stdout_data, stderr_data, exit_code
+
+
+async def capture_login_env():
+    """Capture the environment of an interactive bash login shell once at startup.
+
+    Commands then run in a plain `bash -c` with this environment, so
+    /etc/profile, ~/.profile and ~/.bashrc are not re-read for every command.
+    Keeps the server environment if the login shell cannot be run.
+    """
+    global BASE_ENV
+    process = None
     try:
-        current_time = time.time()
-        temp_pattern = os.path.join(tempfile.gettempdir(), "mcp_cmd_*")
-        for temp_file in glob.glob(temp_pattern):
+        # rc files may print to stdout, so the environment follows a marker
+        process = await asyncio.create_subprocess_exec(
+            "/bin/bash", "-l", "-i", "-c", f"printf '%s\\0' {LOGIN_ENV_MARKER.decode()}; env -0",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            stdin=asyncio.subprocess.DEVNULL,
+            start_new_session=True
+        )
+        stdout_data, _ = await asyncio.wait_for(process.communicate(), timeout=30)
+    except Exception as e:
+        logger.warning("Could not capture login shell environment: %r", e)
+        if process is not None and process.returncode is None:
+            # Don't leave the shell running in its own session
             try:
-                file_age = current_time - os.path.getctime(temp_file)
-                if file_age > 1800:
-                    os.unlink(temp_file)
-            except Exception:
+                os.killpg(process.pid, signal.SIGKILL)
+                await asyncio.wait_for(process.wait(), timeout=1)
+            except (ProcessLookupError, asyncio.TimeoutError):
                 pass
-    except Exception:
-        pass
+        return
+    if process.returncode != 0 or LOGIN_ENV_MARKER not in stdout_data:
+        logger.warning("Login shell exited with code %s, keeping server environment", process.returncode)
+        return
+
+    env = {}
+    for entry in stdout_data.partition(LOGIN_ENV_MARKER + b"\0")[2].split(b"\0"):
+        name, sep, value = entry.partition(b"=")
+        if sep:
+            env[os.fsdecode(name)] = os.fsdecode(value)
+    env["TERM"] = "dumb"
+    BASE_ENV = env
+
+def install_child_watcher(loop):
+    """Wait for subprocesses through pidfds instead of one thread per process.
+
+    Python 3.12+ already does this; older versions default to a watcher
+    that blocks a thread in waitpid() for every running command.
+    """
+    if sys.version_info >= (3, 12) or not sys.platform.startswith("linux"):
+        return
+    try:
+        # pidfd_open() needs Linux 5.3+
+        os.close(os.pidfd_open(os.getpid()))
+    except (AttributeError, OSError):
+        return
+    watcher = asyncio.PidfdChildWatcher()
+    watcher.attach_loop(loop)
+    asyncio.set_child_watcher(watcher)
+
+def error_result(command, error, exit_code=1):
+    """Build the result returned when a command is rejected or could not run."""
+    return {
+        "success": False,
+        "output": "",
+        "stderr": "",
+        "error": error,
+        "exitCode": exit_code,
+        "command": command
+    }
 
 
 server = Server("simple-bash-mcp")
 
-def validate_command(command_str):
-    """Validate that the command is allowed to execute."""
-    # Check for configuration updates
-    check_config_updates()
-    
-    with config_lock:
-        # Extract the base command (first word before any spaces)
-        base_command = command_str.strip().split()[0]
-        
-        # Check if base command is in allowed list
-        if base_command not in config["allowedCommands"]:
-            # Format allowed commands into a readable list
-            allowed_cmds = ", ".join(sorted(config["allowedCommands"]))
-            return False, f"Command '{base_command}' is not in the allowed commands list.\n\nAllowed commands are: {allowed_cmds}"
-        
-        # Optional: Check for command injection patterns if strict validation is enabled
-        if config.get("validateCommandsStrictly", True):
-            injection_patterns = [";", "&&", "||", "`", "$(",  ">", "<", "|", "#"]
-            for pattern in injection_patterns:
-                if pattern in command_str:
-                    # Also include list of injection patterns that should be avoided
-                    patterns_str = ", ".join([f"'{p}'" for p in injection_patterns])
-                    return False, f"Potential command injection detected: '{pattern}'\n\nThe following characters are not allowed when strict validation is enabled: {patterns_str}"
-        
+def validate_request(cfg, command_str, directory):
+    """Validate that the command is allowed to execute in the given directory."""
+    # Extract the base command (first word before any whitespace). maxsplit=1
+    # stops after the first word instead of tokenizing the whole command.
+    words = command_str.split(None, 1)
+    base_command = words[0] if words else ""
+
+    # Check if base command is in allowed list
+    if base_command not in cfg.allowed_commands:
+        return False, f"Command '{base_command}' is not in the allowed commands list.\n\nAllowed commands are: {cfg.allowed_commands_msg}"
+
+    # Optional: Check for command injection patterns if strict validation is enabled
+    if cfg.validate_strictly:
+        match = INJECTION_RE.search(command_str)
+        if match:
+            # Also include list of injection patterns that should be avoided
+            return False, f"Potential command injection detected: '{match.group(0)}'\n\nThe following characters are not allowed when strict validation is enabled: {INJECTION_PATTERNS_STR}"
+
+    directory_path = os.path.realpath(directory)
+
+    # Check if directory is in allowed list or is a subdirectory of an allowed directory
+    if directory_path in cfg.allowed_dirs_exact or directory_path.startswith(cfg.allowed_dir_prefixes):
         return True, ""
 
-def validate_directory(directory):
-    """Validate that the directory is allowed for command execution."""
-    # Check for configuration updates
-    check_config_updates()
-    
-    with config_lock:
-        directory_path = Path(directory).resolve()
-        
-        # Check if directory is in allowed list or is a subdirectory of an allowed directory
-        for allowed_dir in config["allowedDirectories"]:
-            allowed_path = Path(allowed_dir).resolve()
-            if directory_path == allowed_path or allowed_path in directory_path.parents:
-                return True, ""
-        
-        # Format allowed directories into a readable list
-        allowed_dirs = "\n- ".join(config["allowedDirectories"])
-        return False, f"Directory '{directory}' is not in the allowed directories list.\n\nAllowed directories are:\n- {allowed_dirs}\n\nNote: Subdirectories of these allowed directories are also permitted."
+    return False, f"Directory '{directory}' is not in the allowed directories list.\n\nAllowed directories are:\n- {cfg.allowed_dirs_msg}\n\nNote: Subdirectories of these allowed directories are also permitted."
 
 async def execute_command(command, cwd, timeout=None):
     """Execute a command and return its result.
@@ -130,186 +380,148 @@ async def execute_command(command, cwd, timeout=None):
     Implements a secure subprocess execution that isolates MCP stdio transport
     from subprocess I/O to prevent interference with client-server communication.
     """
+    # Configuration changes are picked up by the config watcher; take the
+    # current snapshot once and use it for validation and the output limit.
+    cfg = config
+
     # Validate command and directory
-    cmd_valid, cmd_error = validate_command(command)
-    if not cmd_valid:
-        return {
-            "success": False,
-            "error": cmd_error,
-            "output": "",
-            "exitCode": 1,
-            "command": command
-        }
+    valid, validation_error = validate_request(cfg, command, cwd)
+    if not valid:
+        return error_result(command, validation_error)
     
-    dir_valid, dir_error = validate_directory(cwd)
-    if not dir_valid:
-        return {
-            "success": False,
-            "error": dir_error,
-            "output": "",
-            "exitCode": 1,
-            "command": command
-        }
+    # Use timeout if specified
+    timeout_sec = timeout if timeout else None
+    max_size = cfg.max_output_size
     
     # Execute the command
+    process = None
+    pipes = []
     try:
-        # Use timeout if specified
-        timeout_sec = timeout if timeout else None
-        
-        output_file_handle = None
-        error_file_handle = None
-        
+        # Create both pipes before spawning; the child gets the write ends
+        write_fds = []
         try:
-            output_file_handle = tempfile.NamedTemporaryFile(delete=False, prefix=f"mcp_cmd_output_{uuid.uuid4()}_", suffix=".txt")
-            error_file_handle = tempfile.NamedTemporaryFile(delete=False, prefix=f"mcp_cmd_error_{uuid.uuid4()}_", suffix=".txt")
-            script_file_handle = tempfile.NamedTemporaryFile(delete=False, prefix=f"mcp_cmd_script_{uuid.uuid4()}_", suffix=".sh")
-            output_file = output_file_handle.name
-            error_file = error_file_handle.name
-            script_file = script_file_handle.name
-            with open(script_file, "w") as f:
-                f.write(f"source ~/.bashrc\ncd {shlex.quote(cwd)}\n{command}\n")
-            output_file_handle.close()
-            error_file_handle.close()
-            script_file_handle.close()
-            bash_script = f"""TERM=dumb script -q -c '/bin/bash -l -i < {shlex.quote(script_file)}' /dev/null > {shlex.quote(output_file)} 2> {shlex.quote(error_file)}"""
-        except Exception as e:
-            for handle in (output_file_handle, error_file_handle, script_file_handle):
-                if handle and os.path.exists(handle.name):
-                    try:
-                        os.unlink(handle.name)
-                    except:
-                        pass
-            raise
+            for _ in range(2):
+                reader, transport, write_fd = await open_output_pipe()
+                pipes.append((reader, transport))
+                write_fds.append(write_fd)
+
+            # Run process in a completely separate process group to avoid terminal interference.
+            # Output is collected through pipes private to this server, never the MCP stdio streams.
+            # The command is passed as a single argv entry and the working directory via cwd=,
+            # so there is no shell script or quoting in between.
+            # Do not add preexec_fn/user/group here: without them CPython spawns via vfork()
+            # instead of copying the server's page tables with fork().
+            process = await asyncio.create_subprocess_exec(
+                "/bin/bash", "-c", command,
+                cwd=cwd,
+                stdout=write_fds[0],
+                stderr=write_fds[1],
+                stdin=asyncio.subprocess.DEVNULL,
+                env=BASE_ENV,
+                start_new_session=True
+            )
+        finally:
+            # The child has its own copies; ours would keep the pipes from reaching EOF
+            for write_fd in write_fds:
+                os.close(write_fd)
         
         try:
-            # Run process in a completely separate process group to avoid terminal interference
-            process = subprocess.Popen(
-                bash_script,
-                shell=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                stdin=subprocess.DEVNULL,
-                start_new_session=True
+            stdout_data, stderr_data, exit_code = await asyncio.wait_for(
+                communicate_capped(process, pipes, max_size), timeout=timeout_sec
             )
-
-            
-            # Create asyncio task to wait for process completion with timeout
-            async def wait_for_process():
-                loop = asyncio.get_running_loop()
-                return await loop.run_in_executor(None, process.wait)
-            
+        except asyncio.TimeoutError:
+            # Kill the process if it times out
             try:
-                exit_code = await asyncio.wait_for(wait_for_process(), timeout=timeout_sec)
-                
-                # Read output from temp files
-                stdout_str = ""
-                stderr_str = ""
+                # Kill entire process group (its ID is bash's PID, see
+                # communicate_capped(); bash itself may already be reaped)
+                os.killpg(process.pid, signal.SIGTERM)
+                # Give it up to a second to terminate gracefully
                 try:
-                    if os.path.exists(output_file):
-                        with open(output_file, 'r', encoding='utf-8', errors='replace') as f:
-                            stdout_str = f.read()
-                    if os.path.exists(error_file):
-                        with open(error_file, 'r', encoding='utf-8', errors='replace') as f:
-                            stderr_str = f.read()
-                except Exception as e:
+                    await asyncio.wait_for(process.wait(), timeout=1)
+                except asyncio.TimeoutError:
                     pass
-                finally:
-                    # Always clean up temp files
-                    self_cleanup_tempfiles(output_file, error_file, script_file)
-
-                # Combine output and limit size if needed
-                output = stdout_str
-                if stderr_str:
-                    output += f"\nSTDERR:\n{stderr_str}"
-                    
-                # Check for configuration updates before applying the settings
-                check_config_updates()
-                
-                with config_lock:
-                    max_size = config.get("maxOutputSize", 1048576)  # Default 1MB
-                if len(output) > max_size:
-                    output = output[:max_size] + "\n... [OUTPUT TRUNCATED]"
-                
-                return {
-                    "success": exit_code == 0,
-                    "output": output,
-                    "error": stderr_str if exit_code != 0 else "",
-                    "exitCode": exit_code,
-                    "command": command
-                }
-                
-            except asyncio.TimeoutError:
-                # Kill the process if it times out
-                try:
-                    # Kill entire process group
-                    os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                    # Give it a second to terminate gracefully
-                    await asyncio.sleep(1)
-                    # Force kill if still running
-                    if process.poll() is None:
-                        os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                except Exception:
-                    pass
-                    
-                # Always clean up temp files
-                self_cleanup_tempfiles(output_file, error_file, script_file)
-
-                return {
-                    "success": False,
-                    "output": "",
-                    "error": f"Command execution timed out after {timeout_sec} seconds",
-                    "exitCode": -1,
-                    "command": command
-                }
-        except Exception as e:
-            # Clean up process if needed
-            try:
-                process.kill()
-            except:
+                # Force kill whatever is still running, including jobs that
+                # outlived bash
+                os.killpg(process.pid, signal.SIGKILL)
+                # The pipes are already closed, but stay bounded anyway
+                await asyncio.wait_for(process.wait(), timeout=1)
+            except Exception:
                 pass
-                
-            # Always clean up temp files
-            self_cleanup_tempfiles(output_file, error_file, script_file)
-                            
-            return {
-                "success": False,
-                "output": "",
-                "error": f"Error executing command: {str(e)}",
-                "exitCode": -1,
-                "command": command
-            }
             
+            return error_result(command, f"Command execution timed out after {timeout_sec} seconds", -1)
+        except asyncio.CancelledError:
+            # The tool call was cancelled; don't leave the command running
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            raise
     except Exception as e:
-        return {
-            "success": False,
-            "output": "",
-            "error": f"Error executing command: {str(e)}",
-            "exitCode": -1,
-            "command": command
+        # Clean up process if needed
+        try:
+            process.kill()
+        except:
+            pass
+        
+        return error_result(command, f"Error executing command: {str(e)}", -1)
+    finally:
+        # communicate_capped() closes the pipes, unless spawning failed first
+        for _, transport in pipes:
+            transport.close()
+    
+    # Only the retained prefix of each stream is decoded. stdout and stderr
+    # are returned separately and share one maxOutputSize budget, stdout first.
+    overflowed = len(stdout_data) > max_size or len(stderr_data) > max_size
+    stdout_str = decode_output(stdout_data[:max_size], len(stdout_data) > max_size)
+    if len(stdout_data) > max_size:
+        stdout_str += "\n... [OUTPUT TRUNCATED]"
+    stderr_str = ""
+    if stderr_data:
+        stderr_budget = max_size - min(len(stdout_data), max_size)
+        stderr_str = decode_output(stderr_data[:stderr_budget], len(stderr_data) > stderr_budget)
+        if len(stderr_data) > stderr_budget:
+            stderr_str += "\n... [OUTPUT TRUNCATED]"
+    
+    if overflowed:
+        error = f"Command output exceeded {max_size} bytes and the command was terminated"
+    else:
+        error = stderr_str if exit_code != 0 else ""
+    
+    return {
+        "success": exit_code == 0 and not overflowed,
+        "output": stdout_str,
+        "stderr": stderr_str,
+        "error": error,
+        "exitCode": exit_code,
+        "command": command
+    }
+
+# The tool list never changes, so it is built once and reused for every request
+TOOLS = [
+    types.Tool(
+        name="execute_command",
+        description="Execute a bash command in a secure environment",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "command": {"type": "string", "description": "The bash command to execute"},
+                "cwd": {"type": "string", "description": "Working directory for the command"},
+                "timeout": {"type": "number", "description": "Optional timeout in seconds"}
+            },
+            "required": ["command", "cwd"]
         }
+    )
+]
 
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
     """List available tools."""
-    try:
-        return [
-        types.Tool(
-            name="execute_command",
-            description="Execute a bash command in a secure environment",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "command": {"type": "string", "description": "The bash command to execute"},
-                    "cwd": {"type": "string", "description": "Working directory for the command"},
-                    "timeout": {"type": "number", "description": "Optional timeout in seconds"}
-                },
-                "required": ["command", "cwd"]
-            }
-        )
-    ]
-    except Exception as e:
-        print(f"Error in handle_list_tools: {str(e)}", file=sys.stderr)
-        return []
+    return TOOLS
+
+# Compact separators keep json on its C encoder (indent forces the pure-Python
+# one) and shrink the payload. Non-ASCII output is kept as is rather than
+# \u-escaped; the MCP transport is UTF-8.
+RESULT_ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
 
 @server.call_tool()
 async def handle_call_tool(
@@ -335,48 +547,58 @@ async def handle_call_tool(
     return [
         types.TextContent(
             type="text",
-            text=json.dumps(result, indent=2)
+            text=RESULT_ENCODER.encode(result)
         )
     ]
 
 @server.list_resources()
 async def handle_list_resources() -> list[types.Resource]:
     """Return an empty list of resources."""
-    try:
-        return []
-    except Exception as e:
-        print(f"Error in handle_list_resources: {str(e)}", file=sys.stderr)
-        return []
+    return []
 
 @server.list_prompts()
 async def handle_list_prompts() -> list[types.Prompt]:
     """Return an empty list of prompts."""
-    try:
-        return []
-    except Exception as e:
-        print(f"Error in handle_list_prompts: {str(e)}", file=sys.stderr)
-        return []
+    return []
+
+# Fallback for systems without inotify: periodically check for configuration file changes.
+# Config edits are rare, so a long interval keeps the idle server quiet. While
+# the file cannot be stat'ed (e.g. a network filesystem is down) the interval
+# doubles up to CONFIG_POLL_MAX_INTERVAL.
+CONFIG_POLL_INTERVAL = 60
+CONFIG_POLL_MAX_INTERVAL = 600
 
-# Create a periodic task to check for configuration file changes
 async def config_monitor():
     """Periodically check for changes to the config file."""
+    delay = CONFIG_POLL_INTERVAL
     while True:
-        await asyncio.sleep(5)  # Check every 5 seconds
-        if check_config_updates():
-            print(f"Configuration updated at {time.strftime('%Y-%m-%d %H:%M:%S')}", file=sys.stderr)
+        await asyncio.sleep(delay)
+        try:
+            await check_config_updates()
+            delay = CONFIG_POLL_INTERVAL
+        except OSError as e:
+            delay = min(delay * 2, CONFIG_POLL_MAX_INTERVAL)
+            logger.error("Error checking configuration updates, next check in %s seconds: %s", delay, e)
 
 async def main():
-    # Print a simple startup message to stderr
-    print("Simple-Bash MCP Server starting...", file=sys.stderr)
+    logger.info("Simple-Bash MCP Server starting...")
+    
+    # Reap subprocesses without a waiter thread each, then read the login
+    # shell environment once instead of per command
+    install_child_watcher(asyncio.get_running_loop())
+    await capture_login_env()
     
-    # Start the configuration monitor task
-    monitor_task = asyncio.create_task(config_monitor())
+    # Watch the configuration file, polling only if inotify is unavailable.
+    # The event loop only keeps a weak reference to tasks, so hold on to it.
+    monitor_task = None
+    if start_config_watcher(asyncio.get_running_loop()) is None:
+        monitor_task = asyncio.create_task(config_monitor())
     
     # Add proper exception handling around the core server loop
     try:
         # Run the server using stdin/stdout streams
         async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-            print("MCP server starting stdio server", file=sys.stderr)
+            logger.debug("MCP server starting stdio server")
             try:
                 await server.run(
                     read_stream,
@@ -400,12 +622,12 @@ async def main():
         )
 
             except Exception as e:
-                print(f"Error in server.run: {str(e)}", file=sys.stderr)
-                print(f"Error type: {type(e).__name__}", file=sys.stderr)
-                import traceback
-                traceback.print_exc(file=sys.stderr)
+                logger.exception("Error in server.run: %s", e)
     except Exception as e:
-        print(f"Fatal error in main loop: {str(e)}", file=sys.stderr)
+        logger.exception("Fatal error in main loop: %s", e)
+    finally:
+        if monitor_task is not None:
+            monitor_task.cancel()
 
 
 